@@ -2,8 +2,11 @@ import sys
 import serial
 import serial.tools.list_ports
 import datetime
-import re
 import random
+import selectors
+import threading
+import time
+from collections import deque
 from PySide6.QtWidgets import (
     QLineEdit, QPushButton, QHBoxLayout,
     QApplication, QWidget, QVBoxLayout, QLabel, QGraphicsScene,
@@ -11,8 +14,10 @@ from PySide6.QtWidgets import (
     QDialog, QTableWidget, QTableWidgetItem, QHeaderView
 )
 from PySide6.QtGui import QBrush, QColor, QPen, QPainter
-from PySide6.QtCore import QTimer, Qt, QPointF, QRectF
+from PySide6.QtCore import QTimer, Qt, QPointF, QRectF, QThread, Signal
 import math
+import os
+import numpy as np
 
 # CONFIG
 BAUDRATE = 115200
@@ -20,14 +25,28 @@ NODE_RADIUS = 30
 CENTER_POS = QPointF(450, 300)
 MAX_NODES = 12
 INACTIVE_TIMEOUT = 15  # seconds
+MAX_DIALOG_ROWS = 500  # rows kept in a node's message dialog
+MAX_LOG_MESSAGES = 1000  # messages kept in memory per node
+SERIAL_RETRY_DELAY = 0.5  # seconds the serial reader pauses after a read error before retrying
+SELECT_TIMEOUT = 1.0  # seconds the serial reader waits for data before re-checking the port
 
 SERIAL_PORT = 'COM5'
 
+# Characters allowed in a node address as printed by the mesh leader.
+ADDR_CHARS = b"0123456789abcdef:"
+
+# Returns True if addr consists only of ADDR_CHARS; translate deletes every valid byte in one C-level pass.
+def is_node_addr(addr):
+    return not addr.encode('ascii', 'replace').translate(None, ADDR_CHARS)
+
 class MessageDialog(QDialog):
+    __slots__ = ('table',)
+
     # Initializes the message dialog window that displays all messages received by a specific node.
-    def __init__(self, node_addr, parent=None):
+    # short_name is the node's cached display name (the last four characters of its address).
+    def __init__(self, short_name, parent=None):
         super().__init__(parent)
-        self.setWindowTitle(f"Messages from {node_addr[-4:]}")
+        self.setWindowTitle(f"Messages from {short_name}")
         self.resize(400, 300)
 
         self.table = QTableWidget(0, 2)
@@ -37,15 +56,127 @@ class MessageDialog(QDialog):
         layout = QVBoxLayout(self)
         layout.addWidget(self.table)
 
+    # Fills the table with a node's existing history in one pass, keeping only the newest MAX_DIALOG_ROWS entries.
+    def populate(self, entries):
+        entries = list(entries)[-MAX_DIALOG_ROWS:]
+        self.table.setRowCount(len(entries))
+        for row, (timestamp, message) in enumerate(entries):
+            self.table.setItem(row, 0, QTableWidgetItem(timestamp))
+            self.table.setItem(row, 1, QTableWidgetItem(message))
+        self.table.scrollToBottom()
+
     # Adds a new message to the dialog's table view for the corresponding node.
+    # Once MAX_DIALOG_ROWS is reached, the oldest row's items are recycled for the new message.
     def add_message(self, timestamp, message):
         row = self.table.rowCount()
-        self.table.insertRow(row)
-        self.table.setItem(row, 0, QTableWidgetItem(timestamp))
-        self.table.setItem(row, 1, QTableWidgetItem(message))
+        if row < MAX_DIALOG_ROWS:
+            time_item = QTableWidgetItem(timestamp)
+            msg_item = QTableWidgetItem(message)
+            self.table.insertRow(row)
+        else:
+            row -= 1
+            time_item = self.table.takeItem(0, 0)
+            msg_item = self.table.takeItem(0, 1)
+            time_item.setText(timestamp)
+            msg_item.setText(message)
+            self.table.removeRow(0)
+            self.table.insertRow(row)
+        self.table.setItem(row, 0, time_item)
+        self.table.setItem(row, 1, msg_item)
         self.table.scrollToBottom()
 
+class SerialReader(QThread):
+    lines_ready = Signal(list)
+
+    # Reads from the given serial port on a background thread and emits complete lines in batches.
+    def __init__(self, ser, parent=None):
+        super().__init__(parent)
+        self.serial = ser
+        self._stop = threading.Event()
+        self._rx_tail = b""  # partial line left over from the previous read
+        # Self-pipe that stop() writes to so a pending select() returns at once.
+        self._wake_r, self._wake_w = os.pipe() if sys.platform != "win32" else (None, None)
+
+    # Waits for the port to become readable and drains it, emitting each batch of complete lines.
+    # On POSIX the port's file descriptor is watched with select(), as pyserial's own POSIX backend does; pyserial's
+    # Windows backend has no fileno(), but its blocking read already waits on an OVERLAPPED event, so it is used
+    # directly there.
+    def run(self):
+        selector = None
+        if sys.platform != "win32":
+            try:
+                # Plain select() rather than DefaultSelector: kqueue on macOS doesn't support tty devices.
+                selector = selectors.SelectSelector()
+                selector.register(self.serial.fileno(), selectors.EVENT_READ)
+                selector.register(self._wake_r, selectors.EVENT_READ)
+            except Exception as e:
+                print(f"Serial error: {e}")
+                if selector is not None:
+                    selector.close()
+                selector = None
+        try:
+            while not self._stop.is_set() and self.serial.is_open:
+                # Errors are reported and retried after a short pause, so one bad read doesn't end serial input.
+                try:
+                    if selector is not None:
+                        ready = selector.select(timeout=SELECT_TIMEOUT)
+                        if not ready or any(key.fd == self._wake_r for key, _ in ready):
+                            continue
+                    data = self.serial.read(self.serial.in_waiting or 1)
+                except Exception as e:
+                    print(f"Serial error: {e}")
+                    self._stop.wait(SERIAL_RETRY_DELAY)
+                    continue
+                if not data:
+                    continue
+                # Split on raw bytes and decode only complete, non-blank lines; a trailing partial line is kept
+                # until the rest of it arrives.
+                chunks = (self._rx_tail + data).split(b'\n')
+                self._rx_tail = chunks.pop()
+                lines = [raw.decode('utf-8', 'ignore') for raw in (chunk.strip() for chunk in chunks) if raw]
+                if lines:
+                    self.lines_ready.emit(lines)
+        finally:
+            if selector is not None:
+                selector.close()
+            if self._wake_r is not None:
+                os.close(self._wake_r)
+
+    # Asks the reader loop to exit and wakes it immediately, so closing the window doesn't wait on a timeout.
+    def stop(self):
+        self._stop.set()
+        wake_w, self._wake_w = self._wake_w, None
+        if wake_w is not None:
+            try:
+                os.write(wake_w, b"\0")
+            except OSError:
+                pass
+            os.close(wake_w)
+        # Also interrupt a read already blocked inside pyserial (the only wait on Windows).
+        if self.serial.is_open:
+            self.serial.cancel_read()
+
+class MeshScene(QGraphicsScene):
+    node_clicked = Signal(str)
+
+    # Dispatches clicks on node items (which carry their address in data(0)) through a single handler.
+    # Edges are drawn over the nodes they end on, so look past them for the first item that carries an address.
+    def mousePressEvent(self, event):
+        addr = next((item.data(0) for item in self.items(event.scenePos()) if item.data(0)), None)
+        if addr:
+            self.node_clicked.emit(addr)
+            event.accept()
+        else:
+            super().mousePressEvent(event)
+
 class MeshVisualizer(QWidget):
+    # Shared drawing resources, built once instead of on every redraw.
+    _PEN_LIME = QPen(QColor("lime"))
+    _PEN_LIME.setWidth(2)
+    _BRUSH_RED = QBrush(QColor("red"))
+    _BRUSH_SKY = QBrush(QColor("skyblue"))
+    _BRUSH_ORANGE = QBrush(QColor("orange"))
+
     # Initializes the main mesh visualizer UI, including scene setup, serial port connection, and timer configuration.
     def __init__(self):
         super().__init__()
@@ -56,7 +187,8 @@ class MeshVisualizer(QWidget):
         self.label = QLabel("Live Mesh Topology")
         self.layout.addWidget(self.label)
 
-        self.scene = QGraphicsScene()
+        self.scene = MeshScene()
+        self.scene.node_clicked.connect(self.open_node_dialog)
         self.view = QGraphicsView(self.scene)
         self.view.setRenderHints(self.view.renderHints() | QPainter.Antialiasing)
         self.view.setDragMode(QGraphicsView.ScrollHandDrag)
@@ -75,10 +207,9 @@ class MeshVisualizer(QWidget):
         # This opens the serial port for communication with the mesh leader device.
         self.serial = serial.Serial(SERIAL_PORT, BAUDRATE, timeout=0.1)
 
-        # Timer that regularly checks the serial port for new incoming messages.
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.read_serial)
-        self.timer.start(100)
+        # Background thread that reads the serial port and hands complete lines to the GUI thread.
+        self.reader = SerialReader(self.serial)
+        self.reader.lines_ready.connect(self.on_lines)
 
         # Timer that checks whether nodes are still active based on the last time they sent a message.
         self.status_timer = QTimer()
@@ -92,55 +223,88 @@ class MeshVisualizer(QWidget):
         self.command_response_timer = QTimer()
         self.command_response_timer.setSingleShot(True)
         self.command_response_timer.timeout.connect(self.command_response_label.hide)
+        self._last_resp_hash = None
         self.layout.addWidget(self.command_response_label)
 
         self.nodes = {}         # addr -> (ellipse, label)
         self.positions = {}     # addr -> QPointF
         self.edges = {}         # addr -> QGraphicsLineItem
         self.center_node = None
-        self.message_logs = {}  # addr -> [(timestamp, message)]
+        self.message_logs = {}  # addr -> deque[(timestamp, message)]
         self.dialogs = {}       # addr -> MessageDialog
-        self.last_seen = {}     # addr -> datetime
+        self.short_names = {}   # addr -> short display name
+
+        # Per-node activity state kept as parallel arrays so the activity check is a single vectorized compare.
+        # The NumPy arrays start at MAX_NODES slots and grow as needed; only the first len(self._node_addrs) are used.
+        self._node_index = {}      # addr -> index into the arrays below
+        self._node_addrs = []      # addr
+        self._node_items = []      # QGraphicsEllipseItem
+        self._node_last_seen = np.zeros(MAX_NODES, dtype=np.float64)  # time.monotonic() of the last message
+        self._node_inactive = np.zeros(MAX_NODES, dtype=bool)        # whether the node is drawn as inactive
+
+        # Ring slots around the leader are fixed, so compute them once up front.
+        radius = 200
+        self._ring = [
+            QPointF(CENTER_POS.x() + radius * math.cos(math.radians(i * 360 / MAX_NODES)),
+                    CENTER_POS.y() + radius * math.sin(math.radians(i * 360 / MAX_NODES)))
+            for i in range(MAX_NODES)
+        ]
 
         # Add leader immediately for visualization
-        self.leader_addr = "fd58:47f8:cd8:54c4:0:ff:fe00:fc00"
+        # Interned like parsed addresses, so the leader's dict keys are the same object handle_line looks up.
+        self.leader_addr = sys.intern("fd58:47f8:cd8:54c4:0:ff:fe00:fc00")
         self.add_node(self.leader_addr)
 
-    # Continuously reads incoming lines from the serial port and passes them to the handler while displaying them in the UI.
-    def read_serial(self):
-        lines = []
-        try:
-            while self.serial.in_waiting:
-                line = self.serial.readline().decode(errors='ignore').strip()
-                if line:
-                    lines.append(line)
-                    self.handle_line(line)
-            if lines:
-                self.command_response_label.setText("\n".join(lines))
-                self.command_response_label.show()
-                self.command_response_timer.start(5000)
-        except Exception as e:
-            print(f"Serial error: {e}")
+        self.reader.start()
+
+    # Receives a batch of lines from the serial reader thread, passes them to the handler and displays them in the UI.
+    def on_lines(self, lines):
+        now = time.monotonic()
+        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+        for line in lines:
+            self.handle_line(line, now, timestamp)
+        # Skip re-laying out the label when the same lines are repeated.
+        lines_hash = hash(tuple(lines))
+        if lines_hash != self._last_resp_hash:
+            self._last_resp_hash = lines_hash
+            self.command_response_label.setUpdatesEnabled(False)
+            self.command_response_label.setText("\n".join(lines))
+            self.command_response_label.setUpdatesEnabled(True)
+        self.command_response_label.show()
+        self.command_response_timer.start(5000)
 
     # Parses a serial input line to extract the sender address and message, and creates simulated nodes if applicable.
-    def handle_line(self, line):
-        match = re.search(r"from ([\da-f:]+).*? (.+)$", line)
-        if match:
-            node_addr = match.group(1)
-            message = match.group(2).strip()
-
-            # PATCH: Simulate unique node using custom ID
-            if message.lower().startswith("simulate:"):
-                parts = message.split(None, 1)
-                if len(parts) == 2:
-                    sim_id = parts[0].split(":")[1]
-                    node_addr = f"fd58:sim::{sim_id}"
-                    message = parts[1]
-
-            timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-            self.add_node(node_addr)
-            self.add_message(node_addr, timestamp, message)
-            self.last_seen[node_addr] = datetime.datetime.now()
+    # `now` and `timestamp` are computed once per serial batch by the caller.
+    def handle_line(self, line, now, timestamp):
+        # Lines look like "... from <addr> <message>", so slice the fields out directly. If a "from " is not
+        # followed by a valid address, keep scanning for a later one.
+        start = 0
+        while True:
+            start = line.find("from ", start)
+            if start < 0:
+                return
+            start += 5
+            end = line.find(" ", start)
+            if end < 0:
+                return
+            node_addr = line[start:end]
+            message = line[end + 1:].strip()
+            if node_addr and message and is_node_addr(node_addr):
+                break
+
+        # PATCH: Simulate unique node using custom ID
+        if message.lower().startswith("simulate:"):
+            parts = message.split(None, 1)
+            if len(parts) == 2:
+                sim_id = parts[0].split(":")[1]
+                node_addr = f"fd58:sim::{sim_id}"
+                message = parts[1]
+
+        # The address keys several dicts below; interning it lets those lookups match by identity.
+        node_addr = sys.intern(node_addr)
+        self.add_node(node_addr)
+        self.add_message(node_addr, timestamp, message)
+        self._node_last_seen[self._node_index[node_addr]] = now
 
     # Creates and places a visual node on the scene if it doesn't already exist. Leader is placed at center, others in a circle.
     def add_node(self, addr):
@@ -149,30 +313,34 @@ class MeshVisualizer(QWidget):
                 pos = CENTER_POS
                 self.center_node = addr
             else:
-                angle = len(self.nodes) * (360 / MAX_NODES)
-                radius = 200
-                x = CENTER_POS.x() + radius * math.cos(math.radians(angle))
-                y = CENTER_POS.y() + radius * math.sin(math.radians(angle))
-                pos = QPointF(x, y)
+                pos = self._ring[len(self.nodes) % MAX_NODES]
 
             node = QGraphicsEllipseItem(0, 0, NODE_RADIUS, NODE_RADIUS)
-            color = "orange" if addr == self.center_node else "skyblue"
-            node.setBrush(QBrush(QColor(color)))
+            node.setBrush(self._BRUSH_ORANGE if addr == self.center_node else self._BRUSH_SKY)
             node.setPos(pos)
             node.setFlag(QGraphicsEllipseItem.ItemIsSelectable)
             node.setFlag(QGraphicsEllipseItem.ItemIsMovable)
             node.setData(0, addr)
 
-            label = QGraphicsTextItem(addr[-4:])
+            short = sys.intern(addr[-4:])
+            label = QGraphicsTextItem(short)
             label.setPos(pos + QPointF(NODE_RADIUS + 5, -5))
 
             self.scene.addItem(node)
             self.scene.addItem(label)
 
-            node.mousePressEvent = self.make_node_click_handler(addr)
-
             self.nodes[addr] = (node, label)
             self.positions[addr] = pos
+            self.short_names[addr] = short
+
+            index = len(self._node_addrs)
+            if index == len(self._node_last_seen):
+                self._node_last_seen = np.concatenate((self._node_last_seen, np.zeros(index)))
+                self._node_inactive = np.concatenate((self._node_inactive, np.zeros(index, dtype=bool)))
+            self._node_index[addr] = index
+            self._node_addrs.append(addr)
+            self._node_items.append(node)
+            self._node_last_seen[index] = time.monotonic()
 
             if addr != self.center_node:
                 self.draw_connection(addr)
@@ -184,21 +352,20 @@ class MeshVisualizer(QWidget):
         src = self.positions[addr]
         dst = self.positions[self.center_node]
 
-        line = QGraphicsLineItem(src.x() + NODE_RADIUS/2, src.y() + NODE_RADIUS/2,
-                                 dst.x() + NODE_RADIUS/2, dst.y() + NODE_RADIUS/2)
-        pen = QPen(QColor("lime"))
-        pen.setWidth(2)
-        line.setPen(pen)
-
-        if addr in self.edges:
-            self.scene.removeItem(self.edges[addr])
-        self.edges[addr] = line
-        self.scene.addItem(line)
+        # Each edge is created once and then moved in place on later redraws.
+        line = self.edges.get(addr)
+        if line is None:
+            line = QGraphicsLineItem()
+            line.setPen(self._PEN_LIME)
+            self.scene.addItem(line)
+            self.edges[addr] = line
+        line.setLine(src.x() + NODE_RADIUS/2, src.y() + NODE_RADIUS/2,
+                     dst.x() + NODE_RADIUS/2, dst.y() + NODE_RADIUS/2)
 
     # Adds a message to the node's message history and updates the corresponding dialog if it's open.
     def add_message(self, addr, timestamp, message):
         if addr not in self.message_logs:
-            self.message_logs[addr] = []
+            self.message_logs[addr] = deque(maxlen=MAX_LOG_MESSAGES)
         self.message_logs[addr].append((timestamp, message))
 
         if addr in self.dialogs:
@@ -219,31 +386,31 @@ class MeshVisualizer(QWidget):
 
     # Checks if nodes have been inactive for too long and updates their color accordingly.
     def check_node_activity(self):
-        now = datetime.datetime.now()
-        for addr, (node, _) in self.nodes.items():
-            if addr == self.center_node:
-                continue
-            last_time = self.last_seen.get(addr)
-            if last_time:
-                delta = (now - last_time).total_seconds()
-                if delta > INACTIVE_TIMEOUT:
-                    node.setBrush(QBrush(QColor("red")))
-                else:
-                    node.setBrush(QBrush(QColor("skyblue")))
-
-    # Returns an event handler function that opens the node's message dialog on click.
-    def make_node_click_handler(self, addr):
-        def handler(event):
-            if addr not in self.dialogs:
-                dlg = MessageDialog(addr)
-                self.dialogs[addr] = dlg
-                for timestamp, msg in self.message_logs.get(addr, []):
-                    dlg.add_message(timestamp, msg)
-                dlg.show()
-            else:
-                self.dialogs[addr].raise_()
-                self.dialogs[addr].activateWindow()
-        return handler
+        count = len(self._node_addrs)
+        inactive = (time.monotonic() - self._node_last_seen[:count]) > INACTIVE_TIMEOUT
+        # The leader keeps its own color.
+        inactive[self._node_index[self.center_node]] = False
+        # Only repaint nodes whose state actually changed since the last check.
+        for i in np.flatnonzero(inactive != self._node_inactive[:count]):
+            self._node_items[i].setBrush(self._BRUSH_RED if inactive[i] else self._BRUSH_SKY)
+        self._node_inactive[:count] = inactive
+
+    # Opens the clicked node's message dialog, or brings it to the front if it is already open.
+    def open_node_dialog(self, addr):
+        if addr not in self.dialogs:
+            dlg = MessageDialog(self.short_names[addr])
+            self.dialogs[addr] = dlg
+            dlg.populate(self.message_logs.get(addr, ()))
+            dlg.show()
+        else:
+            self.dialogs[addr].raise_()
+            self.dialogs[addr].activateWindow()
+
+    # Stops the serial reader thread before the window closes.
+    def closeEvent(self, event):
+        self.reader.stop()
+        self.reader.wait()
+        super().closeEvent(event)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)